@@ -7,17 +7,90 @@ This DAG orchestrates the demo data pipeline:
 3. dbt-ol test - Run data quality tests and emit test result events
 4. GE validate - Run Great Expectations checkpoint and emit validation events
 
+dbt builds every model in one task (customers aggregates marts.orders, so the
+marts cannot be built in parallel anyway, and dbt's threads already run independent
+nodes concurrently). GE validates both marts in a single task once they are built:
+the checkpoint runs the suites concurrently in one process, so the GE import cost
+(most of a GE task's runtime) is paid once rather than per mart.
+
+The dbt run task is state-based: after the first run, it only rebuilds nodes that
+changed or errored/failed since the previous run (see dbt_state_run_command).
+Trigger with {"full_refresh": true} to rebuild every model.
+
 Dual transport design (proves both ingestion paths correlate):
 - Airflow task events → Kafka (via openlineage.yml with Kafka transport)
 - dbt-ol events       → HTTP  (BashOperators override OPENLINEAGE_CONFIG to openlineage-http.yml)
-- GE events           → HTTP  (BashOperators override OPENLINEAGE_CONFIG to openlineage-http.yml)
+- GE events           → HTTP  (BashOperators override OPENLINEAGE_CONFIG to /ge/openlineage.yml, batched
+                                by demo-correlator-sidecar via CORRELATOR_SINK)
 """
 
 from datetime import datetime, timedelta
 
 from airflow import DAG
+from airflow.models.param import Param
 from airflow.operators.bash import BashOperator
 
+# Airflow parent/root run of each task, so dbt-ol and GE events nest under it.
+# Shared by every task's env; the macros are rendered per task instance at runtime.
+OL_PARENT_ENV = {
+    "OPENLINEAGE_PARENT_ID": (
+        "{{ macros.OpenLineageProviderPlugin.lineage_parent_id(task_instance) }}"
+    ),
+    "OPENLINEAGE_ROOT_PARENT_ID": (
+        "{{ macros.OpenLineageProviderPlugin.lineage_root_parent_id(task_instance) }}"
+    ),
+}
+
+DBT_ENV = {
+    # Override OPENLINEAGE_CONFIG so dbt-ol uses HTTP (not the Kafka config
+    # that the Airflow OL provider reads from openlineage.yml).
+    "OPENLINEAGE_CONFIG": "/opt/airflow/openlineage-http.yml",
+    # "OPENLINEAGE_NAMESPACE": "dbt",
+    **OL_PARENT_ENV,
+}
+
+# See the ge_validate task below for why OPENLINEAGE_CONFIG must be overridden.
+GE_ENV = {
+    "OPENLINEAGE_CONFIG": "/ge/openlineage.yml",
+    # "OPENLINEAGE_NAMESPACE": "great_expectations",
+    **OL_PARENT_ENV,
+}
+
+# dbt threads per task. dbt runs independent nodes (e.g. the staging models) in
+# parallel, one Postgres connection each, so dbt tasks also take this many slots of
+# the demo_postgres pool to keep its accounting in line with the real DB load.
+DBT_THREADS = 4
+
+# Persistent volume holding the manifest.json/run_results.json of the previous run
+DBT_STATE_DIR = "/dbt-state"
+
+
+def dbt_state_run_command():
+    """Build the state-based dbt-ol run command.
+
+    The first run (or a full_refresh trigger) builds every model. Later runs select
+    state:modified+ result:error+ result:fail+ and --defer to the previous manifest,
+    so only changed or broken nodes (and their children) are rebuilt. State is
+    refreshed after every run, including failed ones, so result:error+ picks up the
+    failures on the next run. Paths are relative to the task's cwd (/dbt).
+    """
+    return f"""
+            {{% if not params.full_refresh %}}
+            if [ -f {DBT_STATE_DIR}/manifest.json ]; then
+                STATE_ARGS="--select state:modified+ result:error+ result:fail+ --defer --state {DBT_STATE_DIR}"
+            fi
+            {{% endif %}}
+            dbt-ol run \\
+                ${{STATE_ARGS}} \\
+                --threads {DBT_THREADS} \\
+                --project-dir . \\
+                --profiles-dir .
+            status=$?
+            cp target/manifest.json target/run_results.json {DBT_STATE_DIR}/
+            exit $status
+        """
+
+
 # Default arguments for all tasks
 default_args = {
     "owner": "correlator-demo",
@@ -26,6 +99,9 @@ default_args = {
     "email_on_retry": False,
     "retries": 1,
     "retry_delay": timedelta(minutes=1),
+    # Every task queries demo-postgres; the pool (created by demo-airflow-init) caps how
+    # many run at once across all DAGs instead of sharing default_pool's 128 slots.
+    "pool": "demo_postgres",
 }
 
 # DAG definition
@@ -36,6 +112,13 @@ with DAG(
         schedule_interval=None,  # Manual trigger only
         start_date=datetime(2024, 1, 1),
         catchup=False,
+        params={
+            "full_refresh": Param(
+                False,
+                type="boolean",
+                description="Ignore saved dbt state and rebuild every selected model",
+            ),
+        },
         tags=["correlator", "demo", "dbt", "great-expectations"],
 ) as dag:
     # Task 1: dbt-ol seed - Load raw data
@@ -43,23 +126,11 @@ with DAG(
     # bare START/COMPLETE job events are emitted (no input/output datasets).
     dbt_seed = BashOperator(
         task_id="dbt_seed",
-        bash_command="""
-            cd /dbt && \
-            dbt-ol seed --profiles-dir . --project-dir .
-        """,
-        env={
-            # Override OPENLINEAGE_CONFIG so dbt-ol uses HTTP (not the Kafka config
-            # that the Airflow OL provider reads from openlineage.yml).
-            "OPENLINEAGE_CONFIG": "/opt/airflow/openlineage-http.yml",
-            # "OPENLINEAGE_NAMESPACE": "dbt",
-            "OPENLINEAGE_PARENT_ID": (
-                "{{ macros.OpenLineageProviderPlugin.lineage_parent_id(task_instance) }}"
-            ),
-            "OPENLINEAGE_ROOT_PARENT_ID": (
-                "{{ macros.OpenLineageProviderPlugin.lineage_root_parent_id(task_instance) }}"
-            ),
-        },
+        bash_command=f"dbt-ol seed --threads {DBT_THREADS} --profiles-dir . --project-dir .",
+        cwd="/dbt",
+        env=DBT_ENV,
         append_env=True,
+        pool_slots=DBT_THREADS,
         doc_md="""
         ### dbt Seed (with dbt-ol)
         Loads raw Jaffle Shop data (customers, orders) into PostgreSQL.
@@ -74,53 +145,36 @@ with DAG(
     # Task 2: dbt-ol run - Transform data with lineage emission
     dbt_run = BashOperator(
         task_id="dbt_run",
-        bash_command="""
-            cd /dbt && \
-            dbt-ol run \
-                --project-dir . \
-                --profiles-dir .
-        """,
-        env={
-            "OPENLINEAGE_CONFIG": "/opt/airflow/openlineage-http.yml",
-            # "OPENLINEAGE_NAMESPACE": "dbt",
-            "OPENLINEAGE_PARENT_ID": (
-                "{{ macros.OpenLineageProviderPlugin.lineage_parent_id(task_instance) }}"
-            ),
-            "OPENLINEAGE_ROOT_PARENT_ID": (
-                "{{ macros.OpenLineageProviderPlugin.lineage_root_parent_id(task_instance) }}"
-            ),
-        },
+        bash_command=dbt_state_run_command(),
+        cwd="/dbt",
+        env=DBT_ENV,
         append_env=True,
+        pool_slots=DBT_THREADS,
         doc_md="""
         ### dbt Run (with dbt-ol)
         Executes all dbt models and emits OpenLineage lineage events:
         - Staging: stg_customers, stg_orders (views)
-        - Marts: customers, orders (tables with aggregations)
+        - Marts: orders, customers (tables; customers aggregates orders)
 
+        State-based: only nodes changed or broken since the last run are rebuilt.
         Emits lineage events with input/output datasets and runtime metrics.
         """,
     )
 
     # Task 3: dbt-ol test - Data quality tests with event emission
+    # When re-enabled, chain it between dbt_run and ge_validate.
     # dbt_test = BashOperator(
     #     task_id="dbt_test",
-    #     bash_command="""
-    #         cd /dbt && \
+    #     bash_command=f"""
     #         dbt-ol test \
+    #             --threads {DBT_THREADS} \
     #             --project-dir . \
     #             --profiles-dir .
     #     """,
-    #     env={
-    #         "OPENLINEAGE_CONFIG": "/opt/airflow/openlineage-http.yml",
-    #         # "OPENLINEAGE_NAMESPACE": "dbt",
-    #         "OPENLINEAGE_PARENT_ID": (
-    #             "{{ macros.OpenLineageProviderPlugin.lineage_parent_id(task_instance) }}"
-    #         ),
-    #         "OPENLINEAGE_ROOT_PARENT_ID": (
-    #             "{{ macros.OpenLineageProviderPlugin.lineage_root_parent_id(task_instance) }}"
-    #         ),
-    #     },
+    #     cwd="/dbt",
+    #     env=DBT_ENV,
     #     append_env=True,
+    #     pool_slots=DBT_THREADS,
     #     doc_md="""
     #     ### dbt Test (with dbt-ol)
     #     Runs schema tests defined in schema.yml and emits test result events:
@@ -134,7 +188,7 @@ with DAG(
 
     # Task 4: Great Expectations validation
     #
-    # OPENLINEAGE_CONFIG must be overridden to the HTTP config. The container-level env
+    # OPENLINEAGE_CONFIG must be overridden to the GE config. The container-level env
     # points to the Kafka config (openlineage.yml), and the OL Python client's transport
     # resolution evaluates config-file transport BEFORE the url argument:
     #
@@ -150,35 +204,30 @@ with DAG(
     # demo_checkpoint.py passes OPENLINEAGE_URL as openlineage_host to the GE action,
     # which calls OpenLineageClient(url=...). But step 3 wins over step 4 — the Kafka
     # transport from the container's config file would be used, not the URL argument.
-    # This override points OPENLINEAGE_CONFIG to an HTTP-only YAML so GE events go via HTTP.
+    # This override points OPENLINEAGE_CONFIG to the GE YAML, whose batching transport
+    # sends GE events via HTTP to Correlator's batch endpoint (one request per flush).
+    #
+    # Both marts are validated by one task: importing GE takes seconds and dominates the
+    # task, while the validations themselves take well under a second and run
+    # concurrently within demo_checkpoint.py. A per-mart task would pay the import
+    # twice, and both marts are ready at the same time (when dbt_run finishes).
     ge_validate = BashOperator(
         task_id="ge_validate",
-        bash_command="""
-            cd /ge && \
-            python checkpoints/demo_checkpoint.py
-        """,
-        env={
-            "OPENLINEAGE_CONFIG": "/opt/airflow/openlineage-http.yml",
-            # "OPENLINEAGE_NAMESPACE": "great_expectations",
-            "OPENLINEAGE_PARENT_ID": (
-                "{{ macros.OpenLineageProviderPlugin.lineage_parent_id(task_instance) }}"
-            ),
-            "OPENLINEAGE_ROOT_PARENT_ID": (
-                "{{ macros.OpenLineageProviderPlugin.lineage_root_parent_id(task_instance) }}"
-            ),
-        },
+        bash_command="python checkpoints/demo_checkpoint.py --suite all",
+        cwd="/ge",
+        env=GE_ENV,
         append_env=True,
+        # One Postgres connection per concurrently validated mart
+        pool_slots=2,
         doc_md="""
         ### Great Expectations Validate
-        Runs the demo checkpoint to validate:
-        - customers mart: row counts, uniqueness, data types
-        - orders mart: row counts, value ranges, referential integrity
+        Runs the demo checkpoint against both mart tables:
+        - orders: row counts, required columns, uniqueness, non-null and ranges
+        - customers: row counts, required columns, uniqueness, non-null and ranges
 
         Emits OpenLineage events to Correlator via standard OL GE action.
         """,
     )
 
     # Define task dependencies
-    # Linear pipeline: seed -> run -> test -> validate
-    # dbt_seed >> dbt_run >> dbt_test >> ge_validate
     dbt_seed >> dbt_run >> ge_validate
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Correlator Demo - OpenLineage Sidecar Collector
+
+Listens on a Unix stream socket for newline-delimited OpenLineage events (as
+written by correlator_transport.BatchingHttpTransport when a sink is set) and
+forwards them to Correlator's batch endpoint (POST /api/v1/lineage/batch).
+
+Forwarding reuses the transport's batching emitter, so the sidecar batches,
+pools connections, retries and spools undelivered batches exactly like the
+in-process HTTP path, but once for every GE process on the host instead of
+once per checkpoint run. Being long-lived, it also re-sends spooled batches
+every `spool_replay_interval` seconds, so events spooled during a Correlator
+outage are delivered once it is back. Queued events are flushed on
+SIGTERM/SIGINT.
+
+Usage:
+    python checkpoints/correlator_sidecar.py [--socket PATH]
+
+Environment variables:
+    OPENLINEAGE_CONFIG   - OL config whose `transport` section (url, endpoint,
+                           batch_size, spool_dir, ...) configures forwarding
+    CORRELATOR_SINK      - Socket to listen on (unix:///path/to/socket), unless
+                           --socket is given
+"""
+
+import argparse
+import json
+import logging
+import os
+import signal
+import socketserver
+import sys
+import threading
+
+import yaml
+
+from correlator_transport import BatchingHttpConfig, _BatchEmitter, unix_socket_path
+
+log = logging.getLogger("correlator_sidecar")
+
+
+def load_config(config_path, socket_path):
+    """Build the forwarding config from the `transport` section of the OL config file."""
+    with open(config_path, encoding="utf-8") as f:
+        transport = (yaml.safe_load(f) or {}).get("transport", {})
+    config = BatchingHttpConfig.from_dict(transport)
+    # The sidecar is the sink: forward over HTTP rather than back into the socket
+    config.sink = None
+    return config, socket_path or unix_socket_path(transport.get("sink") or os.environ["CORRELATOR_SINK"])
+
+
+def make_server(socket_path, emitter):
+    """Create a threaded Unix socket server that queues each received event on the emitter."""
+
+    class EventHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for line in self.rfile:
+                line = line.strip()
+                if not line:
+                    continue
+                # The emitter splices events into a JSON array verbatim, so one malformed
+                # line would get the whole batch rejected
+                try:
+                    json.loads(line)
+                except ValueError:
+                    log.warning("Dropping malformed OpenLineage event: %.200r", line)
+                    continue
+                emitter.put(line.decode("utf-8"))
+
+    # A socket file left behind by a previous run would make bind() fail
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    os.makedirs(os.path.dirname(socket_path), exist_ok=True)
+
+    server = socketserver.ThreadingUnixStreamServer(socket_path, EventHandler)
+    server.daemon_threads = True
+    # Writable by the (non-root) Airflow user in other containers sharing the volume
+    os.chmod(socket_path, 0o666)
+    return server
+
+
+def parse_args():
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser(description="Forward OpenLineage events from a Unix socket to Correlator.")
+    parser.add_argument(
+        "--socket",
+        help="Socket path to listen on (default: from CORRELATOR_SINK or the config's transport.sink).",
+    )
+    return parser.parse_args()
+
+
+def main():
+    """Run the sidecar until SIGTERM/SIGINT, then flush queued events."""
+    logging.basicConfig(level=logging.INFO, format="%(name)s %(levelname)s: %(message)s")
+    args = parse_args()
+
+    config, socket_path = load_config(
+        os.environ.get("OPENLINEAGE_CONFIG", "openlineage.yml"), args.socket
+    )
+    emitter = _BatchEmitter(config)
+    server = make_server(socket_path, emitter)
+
+    # shutdown() blocks until serve_forever() returns, so it can't run on the serving thread
+    def stop(signum, frame):
+        threading.Thread(target=server.shutdown).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    log.info("Forwarding OpenLineage events from %s to %s", socket_path, emitter.url)
+    server.serve_forever()
+
+    server.server_close()
+    os.unlink(socket_path)
+    flushed = emitter.close(config.timeout)
+    log.info("Stopped%s", "" if flushed else " (timed out flushing queued events)")
+    sys.exit(0 if flushed else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,462 @@
+"""
+Correlator Demo - Batching OpenLineage Transport
+
+OpenLineage transport that queues events in-process and POSTs them to
+Correlator's batch endpoint (POST /api/v1/lineage/batch) as a JSON array,
+instead of one HTTP request per event.
+
+A background thread flushes the queue when it reaches `batch_size` events or
+`flush_interval` seconds after the last flush, whichever comes first. A batch
+is also flushed before its JSON body would exceed `max_batch_bytes`, which
+must not be above Correlator's request size limit (1 MiB by default,
+CORRELATOR_MAX_REQUEST_SIZE): an oversized body is rejected with 413, and a
+rejected batch is not retried. The
+queue is drained on close() and at interpreter exit, so sys.exit() in the
+checkpoint runner does not drop events. All batches share one pooled
+requests.Session, so the TCP connection is reused and transient gateway
+errors are retried with backoff.
+
+GE instantiates the OL action, and therefore the client and transport, once
+per validation. Transports for the same endpoint share one process-wide
+emitter, so all validations in a checkpoint run land in the same batches.
+
+Batches are sent from a small thread pool, so up to `max_concurrent_requests`
+batches are in flight at once (e.g. when a large backlog is drained on exit)
+and a slow response does not hold up the next flush. Batches may therefore
+arrive out of order; the GE action only emits one terminal event per run, so
+no per-run ordering is lost.
+
+With `spool_dir` set, each batch is written to a file in that directory before
+it is sent and removed once Correlator accepts it. Batches that could not be
+delivered (Correlator down, 5xx, timeouts) stay on disk and are re-sent
+later, so an outage does not lose events. Ingestion is idempotent, so a
+batch that is sent twice is harmless. The spool is bounded: files older than
+`spool_max_age_hours` are dropped, and the oldest files are dropped while it
+holds more than `spool_max_bytes`.
+
+Replay runs on its own daemon thread and never delays the run: every
+`spool_replay_interval` seconds it re-sends at most `spool_replay_max_files`
+files, one at a time, and stops at the first batch that still cannot be
+delivered. It is not waited for at exit (only the run's own batches are
+flushed), so a short-lived run gets one pass and a long-lived emitter, like
+the sidecar's, keeps draining the spool once Correlator is back.
+
+The GE OL action builds its client from the OpenLineage config file, so this
+transport is selected by type in great-expectations/openlineage.yml:
+
+    transport:
+      type: correlator_transport.BatchingHttpTransport
+      url: http://demo-correlator:8080
+      endpoint: api/v1/lineage/batch
+      batch_size: 50
+      flush_interval: 5.0
+      max_concurrent_requests: 4
+      spool_dir: /var/spool/correlator
+
+With `sink` set to a unix:// URL (or CORRELATOR_SINK in the environment), events
+are instead written as newline-delimited JSON to that Unix socket, where
+correlator_sidecar.py batches and POSTs them. Writing to the socket is a local
+hop, so the checkpoint does not wait on Correlator at all. If the sidecar is
+unreachable, events fall back to the HTTP batching path above, and the socket
+is retried after `sink_retry_interval` seconds.
+
+Like any OpenLineage transport setting, these can also be supplied through
+environment variables, e.g. OPENLINEAGE__TRANSPORT__SPOOL_DIR (the file wins
+where both set the same key).
+
+The module must be importable, which it is for scripts in this directory
+(python puts the script's directory first on sys.path).
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import socket
+import threading
+import time
+import uuid
+from typing import Optional
+from urllib.parse import urljoin, urlparse
+
+import attr
+import requests
+from openlineage.client.serde import Serde
+from openlineage.client.transport import Config, Transport
+from openlineage.client.utils import get_only_specified_fields
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+log = logging.getLogger(__name__)
+
+# Queue sentinel telling the worker to flush what it has and exit
+_STOP = object()
+
+# POST is not retried by urllib3 by default; batches are idempotent on the Correlator
+# side (duplicate events are detected), so it is safe to allow it here.
+_RETRY = Retry(
+    total=3,
+    backoff_factor=0.2,
+    status_forcelist=[502, 503, 504],
+    allowed_methods=["POST"],
+)
+
+
+@attr.define
+class BatchingHttpConfig(Config):
+    url: str
+    endpoint: str = "api/v1/lineage/batch"
+    timeout: float = attr.field(default=30.0, converter=float)
+    batch_size: int = attr.field(default=50, converter=int)
+    max_batch_bytes: int = attr.field(default=1024 * 1024, converter=int)
+    flush_interval: float = attr.field(default=5.0, converter=float)
+    max_concurrent_requests: int = attr.field(default=4, converter=int)
+    spool_dir: Optional[str] = None
+    spool_max_age_hours: float = attr.field(default=24.0, converter=float)
+    spool_max_bytes: int = attr.field(default=50 * 1024 * 1024, converter=int)
+    spool_replay_max_files: int = attr.field(default=20, converter=int)
+    spool_replay_interval: float = attr.field(default=60.0, converter=float)
+    sink: Optional[str] = attr.field(factory=lambda: os.environ.get("CORRELATOR_SINK") or None)
+    sink_retry_interval: float = attr.field(default=30.0, converter=float)
+
+    @classmethod
+    def from_dict(cls, params):
+        if "url" not in params:
+            raise RuntimeError("`url` key not passed to BatchingHttpConfig")
+        return cls(**get_only_specified_fields(cls, params))
+
+
+def unix_socket_path(sink):
+    """Return the socket path of a unix:///path sink URL."""
+    parsed = urlparse(sink)
+    if parsed.scheme != "unix" or not parsed.path:
+        raise ValueError(f"Unsupported Correlator sink {sink!r}, expected unix:///path/to/socket")
+    return parsed.path
+
+
+class BatchingHttpTransport(Transport):
+    """Queue events and POST them to Correlator's batch endpoint from a background thread."""
+
+    kind = "correlator_batch"
+    config_class = BatchingHttpConfig
+
+    # (url, endpoint) -> emitter, and socket path -> sink, shared by every transport
+    # instance in this process
+    _emitters = {}
+    _sinks = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, config):
+        self.config = config
+        self._sink = None
+        if config.sink:
+            path = unix_socket_path(config.sink)
+            with self._shared_lock:
+                self._sink = self._sinks.setdefault(
+                    path, _SocketSink(path, config.timeout, config.sink_retry_interval)
+                )
+            # The HTTP emitter (threads, session, spool replay) is only started on fallback
+            self._emitter = None
+        else:
+            self._emitter = self._http_emitter()
+
+    def _http_emitter(self):
+        key = (self.config.url.strip(), self.config.endpoint)
+        with self._shared_lock:
+            emitter = self._emitters.get(key)
+            if emitter is None or emitter.closed:
+                emitter = self._emitters[key] = _BatchEmitter(self.config)
+        return emitter
+
+    def emit(self, event):
+        event_json = Serde.to_json(event)
+        if self._sink is not None and self._sink.send(event_json):
+            return
+        if self._emitter is None:
+            self._emitter = self._http_emitter()
+        self._emitter.put(event_json)
+
+    def close(self, timeout=-1):
+        if self._emitter is None:
+            return True
+        return self._emitter.close(timeout)
+
+
+class _SocketSink:
+    """Write events as newline-delimited JSON to a local sidecar's Unix stream socket."""
+
+    def __init__(self, path, timeout, retry_interval):
+        self.path = path
+        self.timeout = timeout
+        self.retry_interval = retry_interval
+        self._sock = None
+        self._retry_at = 0.0
+        self._lock = threading.Lock()
+
+    def send(self, event_json):
+        """Write one event. Returns False if the sidecar is unreachable (use the fallback)."""
+        with self._lock:
+            if self._sock is None:
+                if time.monotonic() < self._retry_at:
+                    return False
+                try:
+                    self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                    # Bounds connect/sendall if the sidecar stops reading
+                    self._sock.settimeout(self.timeout)
+                    self._sock.connect(self.path)
+                except OSError as e:
+                    log.warning("Correlator sidecar at %s unreachable, falling back to HTTP: %s", self.path, e)
+                    self._disconnect()
+                    return False
+            try:
+                self._sock.sendall(event_json.encode("utf-8") + b"\n")
+            except OSError as e:
+                log.warning("Lost connection to Correlator sidecar at %s, falling back to HTTP: %s", self.path, e)
+                self._disconnect()
+                return False
+            return True
+
+    def _disconnect(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+        self._retry_at = time.monotonic() + self.retry_interval
+
+
+class _BatchEmitter:
+    """Queue serialized events and POST them in batches from background threads."""
+
+    def __init__(self, config):
+        self.config = config
+        self.url = urljoin(config.url.strip(), config.endpoint)
+        self._session = requests.Session()
+        self._session.mount(
+            self.url,
+            HTTPAdapter(
+                pool_connections=1,
+                pool_maxsize=config.max_concurrent_requests,
+                max_retries=_RETRY,
+            ),
+        )
+        self._queue = queue.Queue()
+        self._batches = queue.Queue()
+        self._closed = False
+        # Monotonic time by which the first close() gave up waiting (None: no limit)
+        self._close_deadline = None
+        # Set by close() to end the replay loop's wait early
+        self._stopped = threading.Event()
+        self._spool_dir = self._open_spool(config.spool_dir)
+        # Plain threads rather than a ThreadPoolExecutor: executors stop accepting work
+        # at interpreter shutdown, before atexit handlers get the chance to drain.
+        self._senders = [
+            threading.Thread(target=self._send_batches, name=f"correlator-batch-send-{i}", daemon=True)
+            for i in range(config.max_concurrent_requests)
+        ]
+        self._worker = threading.Thread(
+            target=self._run, name="correlator-batch-emitter", daemon=True
+        )
+        for thread in [*self._senders, self._worker]:
+            thread.start()
+        atexit.register(self.close)
+        if self._spool_dir is not None:
+            # Not joined by close(): exit only waits for this run's own batches
+            threading.Thread(
+                target=self._replay_loop, name="correlator-spool-replay", daemon=True
+            ).start()
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def put(self, event_json):
+        if self._closed:
+            log.warning("Transport is closed, dropping OpenLineage event")
+            return
+        self._queue.put(event_json)
+
+    def close(self, timeout=-1):
+        """Flush queued events and stop the worker. Safe to call more than once.
+
+        A repeated call without a timeout (e.g. the atexit hook after the owner's own
+        close() timed out) keeps the first call's deadline instead of waiting forever.
+        """
+        if not self._closed:
+            self._closed = True
+            self._stopped.set()
+            self._queue.put(_STOP)
+            if timeout >= 0:
+                self._close_deadline = time.monotonic() + timeout
+        elif timeout < 0 and self._close_deadline is not None:
+            timeout = max(0.0, self._close_deadline - time.monotonic())
+        self._worker.join(None if timeout < 0 else timeout)
+        if self._worker.is_alive():
+            return False
+        self._session.close()
+        return True
+
+    def _run(self):
+        batch = []
+        # Size of the batch's JSON body: the brackets plus each event and its separator
+        batch_bytes = 1
+        deadline = time.monotonic() + self.config.flush_interval
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = None
+
+            stop = item is _STOP
+            if item is not None and not stop:
+                size = len(item.encode("utf-8")) + 1
+                # Flush first rather than send a body Correlator would reject
+                if batch and batch_bytes + size > self.config.max_batch_bytes:
+                    self._flush(batch)
+                    batch, batch_bytes = [], 1
+                batch.append(item)
+                batch_bytes += size
+
+            due = time.monotonic() >= deadline
+            if batch and (stop or due or len(batch) >= self.config.batch_size):
+                self._flush(batch)
+                batch, batch_bytes = [], 1
+                due = True
+            if due:
+                deadline = time.monotonic() + self.config.flush_interval
+            if stop:
+                for _ in self._senders:
+                    self._batches.put(_STOP)
+                for sender in self._senders:
+                    sender.join()
+                return
+
+    def _flush(self, batch):
+        body = "[" + ",".join(batch) + "]"
+        self._batches.put((body, len(batch), self._spool(body)))
+
+    def _send_batches(self):
+        while (batch := self._batches.get()) is not _STOP:
+            self._send(*batch)
+
+    def _send(self, body, count, spool_path):
+        """POST one batch. Returns False if it could not be delivered and is worth retrying."""
+        try:
+            resp = self._session.post(
+                self.url,
+                data=body,
+                headers={"Content-Type": "application/json"},
+                timeout=self.config.timeout,
+            )
+            resp.raise_for_status()
+        except requests.RequestException as e:
+            resp = e.response
+            # Client errors (other than timeouts/throttling) will fail the same way on
+            # every retry, so only keep the batch for connection errors and 5xx.
+            if resp is not None and resp.status_code < 500 and resp.status_code not in (408, 429):
+                log.error("Correlator rejected batch of %d OpenLineage events: %s", count, e)
+                self._unspool(spool_path)
+                return True
+            if spool_path:
+                log.error(
+                    "Failed to send %d OpenLineage events to %s, kept in %s: %s",
+                    count, self.url, spool_path, e,
+                )
+            else:
+                log.error("Failed to send %d OpenLineage events to %s: %s", count, self.url, e)
+            return False
+
+        self._unspool(spool_path)
+        # 207 Multi-Status: some events were rejected, details are in the response body
+        if resp.status_code == 207:
+            log.warning("Correlator partially accepted batch of %d events: %s", count, resp.text)
+        else:
+            log.debug("Sent batch of %d OpenLineage events to %s", count, self.url)
+        return True
+
+    @staticmethod
+    def _open_spool(spool_dir):
+        """Create the spool directory, or return None (spooling disabled) if unset or unusable."""
+        if not spool_dir:
+            return None
+        try:
+            os.makedirs(spool_dir, exist_ok=True)
+        except OSError as e:
+            log.warning("Cannot use spool dir %s, batches will not be persisted: %s", spool_dir, e)
+            return None
+        return spool_dir
+
+    def _spool(self, body):
+        """Persist a batch before it is sent. Returns the spool file path, or None."""
+        if self._spool_dir is None:
+            return None
+        # Names sort by creation time; the pid/uuid suffix keeps concurrent processes apart.
+        name = f"{time.time_ns()}-{os.getpid()}-{uuid.uuid4().hex[:8]}.json"
+        path = os.path.join(self._spool_dir, name)
+        try:
+            # Write under a temporary name so a partially written file is never replayed
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                f.write(body)
+            os.replace(path + ".tmp", path)
+        except OSError as e:
+            log.warning("Failed to spool batch to %s: %s", path, e)
+            return None
+        return path
+
+    @staticmethod
+    def _unspool(path):
+        if path:
+            # Another process replaying the spool may have sent and removed it already
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _replay_loop(self):
+        while not self._closed:
+            self._replay_spool()
+            self._stopped.wait(self.config.spool_replay_interval)
+
+    def _replay_spool(self):
+        """Prune the spool to its age/size bounds and re-send the oldest remaining batches."""
+        now = time.time()
+        spooled = []
+        with os.scandir(self._spool_dir) as entries:
+            for entry in entries:
+                if not entry.name.endswith(".json"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                spooled.append((entry.name, entry.path, stat.st_mtime, stat.st_size))
+
+        spooled.sort()
+        total_bytes = sum(size for *_, size in spooled)
+        max_age = self.config.spool_max_age_hours * 3600
+        pending = []
+        for name, path, mtime, size in spooled:
+            if now - mtime > max_age or total_bytes > self.config.spool_max_bytes:
+                log.warning("Dropping spooled OpenLineage batch %s (spool over its age/size limit)", name)
+                self._unspool(path)
+                total_bytes -= size
+            # Newer files may belong to another process whose POST is still in flight
+            elif now - mtime > self.config.timeout:
+                pending.append(path)
+
+        for path in pending[:self.config.spool_replay_max_files]:
+            if self._closed:
+                return
+            try:
+                with open(path, encoding="utf-8") as f:
+                    body = f.read()
+                count = len(json.loads(body))
+            except FileNotFoundError:
+                continue
+            except ValueError:
+                log.warning("Dropping unreadable spooled OpenLineage batch %s", path)
+                self._unspool(path)
+                continue
+            log.info("Re-sending %d spooled OpenLineage events from %s", count, path)
+            # Correlator is still unreachable: leave the rest for the next pass
+            if not self._send(body, count, path):
+                return